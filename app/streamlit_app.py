@@ -1,16 +1,22 @@
 """
 Streamlit app for the financial dashboard
 """
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import mplcursors
-import seaborn as sns
-from pathlib import Path
 import plotly.graph_objects as go
-from matplotlib import cm, colors as mcolors
-from utils import read_csv_to_df, combine_dataframes, agg_monthly, agg_by_category_year
+import plotly.io as pio
+from plotly.colors import sample_colorscale
+from utils import (
+    read_csv_to_df,
+    combine_dataframes,
+    agg_monthly,
+    agg_by_category_year,
+    monthly_cube,
+)
+
+pio.templates.default = "simple_white"
 
 st.set_page_config(page_title="Financial Dashboard", layout="wide")
 
@@ -30,11 +36,19 @@ uploaded_files = st.sidebar.file_uploader(
 dfs = []
 errors = []
 if uploaded_files:
-    for f in uploaded_files:
+    def read_one(f):
         try:
-            dfs.append(read_csv_to_df(f))
+            return read_csv_to_df(f), None
         except Exception as e:
-            errors.append(str(e))
+            return None, str(e)
+
+    # Parsing releases the GIL, so files are read concurrently
+    with ThreadPoolExecutor(max_workers=min(8, len(uploaded_files))) as ex:
+        for df, err in ex.map(read_one, uploaded_files):
+            if err is None:
+                dfs.append(df)
+            else:
+                errors.append(err)
 
 
 if errors:
@@ -58,20 +72,36 @@ selected_categories = st.sidebar.multiselect("Categories", categories, default=c
 accounts = sorted(combined["Account"].dropna().unique().tolist())
 selected_accounts = st.sidebar.multiselect("Accounts", accounts, default=accounts)
 
-chart_type = st.sidebar.radio("Chart type", ["Line", "Bar", "Stacked Bar", "Pie"])
 
 # Apply filters
-df_filtered = combined[
-    (combined["Year"].isin(selected_years))
-    & (combined["Category"].isin(selected_categories))
-    & (combined["Account"].isin(selected_accounts))
-]
+@st.cache_data(show_spinner=False)
+def filter_df(combined, years, cats, accts):
+    mask = np.isin(combined["Year"].to_numpy(), years)
+    for col, selected in (("Category", cats), ("Account", accts)):
+        codes = combined[col].cat.codes.to_numpy()
+        sel_codes = combined[col].cat.categories.get_indexer(list(selected))
+        mask &= np.isin(codes, sel_codes[sel_codes >= 0])
+    return combined.iloc[mask]
+
+
+df_filtered = filter_df(
+    combined,
+    tuple(selected_years),
+    tuple(selected_categories),
+    tuple(selected_accounts),
+)
 
-# Main layout
-left_col, right_col = st.columns([3, 1])
+@st.cache_data(show_spinner=False, hash_funcs={go.Figure: lambda f: f.to_json()})
+def figure_png(fig):
+    return fig.to_image(format="png", width=1000, height=500)
 
-with left_col:
-    st.header("Trends & Charts")
+
+# Chart controls live inside the fragment, so changing them reruns only
+# the chart block instead of the whole script
+@st.fragment
+def render_charts(df_filtered):
+    chart_type = st.radio("Chart type", ["Line", "Bar", "Stacked Bar", "Pie"], horizontal=True)
+    static = st.checkbox("Static (fast) rendering", value=False)
 
     # Monthly aggregation
     monthly = agg_monthly(df_filtered)
@@ -79,65 +109,39 @@ with left_col:
     if monthly.empty:
         st.warning("No transactions found for selected filters")
     else:
-        fig, ax = plt.subplots(figsize=(10, 5))
-
         def palette_hex(cmap_name, n):
             if n == 0:
                 return []
-            cmap = cm.get_cmap(cmap_name)
-            vals = cmap(np.linspace(0.35, 0.85, n))
-            return [mcolors.to_hex(v) for v in vals]
+            vals = sample_colorscale(cmap_name, np.linspace(0.35, 0.85, n), colortype="tuple")
+            return ["#{:02x}{:02x}{:02x}".format(*(round(c * 255) for c in v)) for v in vals]
 
 
         # ----------------------------- LINE CHART -----------------------------
         if chart_type == "Line":
-            fig = go.Figure()
-
-            fig.add_trace(go.Scatter(
-                x=monthly["YearMonth"],
-                y=monthly["Income"],
-                mode='lines+markers',
-                name='Income'
-            ))
-
-            fig.add_trace(go.Scatter(
-                x=monthly["YearMonth"],
-                y=monthly["Expense"],
-                mode='lines+markers',
-                name='Expense'
-            ))
-
-            fig.add_trace(go.Scatter(
-                x=monthly["YearMonth"],
-                y=monthly["Net"],
-                mode='lines+markers',
-                name='Net'
-            ))
-
-            fig.update_layout(
+            traces = [
+                go.Scatter(
+                    x=monthly["YearMonth"],
+                    y=monthly[name],
+                    mode='lines+markers',
+                    name=name
+                )
+                for name in ["Income", "Expense", "Net"]
+            ]
+
+            fig = go.Figure(data=traces, layout=dict(
                 title="Monthly Income / Expense / Net",
                 xaxis_title="Month",
                 yaxis_title="Amount",
-                template="simple_white"
-            )
+            ))
 
 
         # ---------------------- SIDE-BY-SIDE STACKED BAR CHART ----------------------
         elif chart_type == "Bar":
-            df_copy = df_filtered.copy()
-            df_copy["YearMonth"] = df_copy["Date"].dt.to_period("M").dt.to_timestamp()
+            cube = monthly_cube(df_filtered)["Amount"]
+            types = cube.index.get_level_values("Type")
 
-            income_df = df_copy[df_copy["Type"] == "Income"]
-            expense_df = df_copy[df_copy["Type"] == "Expense"]
-
-            income_pivot = income_df.pivot_table(
-                index="YearMonth", columns="Category", values="Amount",
-                aggfunc="sum", fill_value=0
-            )
-            expense_pivot = expense_df.pivot_table(
-                index="YearMonth", columns="Category", values="Amount",
-                aggfunc="sum", fill_value=0
-            )
+            income_pivot = cube[types == "Income"].droplevel("Type").unstack("Category", fill_value=0)
+            expense_pivot = cube[types == "Expense"].droplevel("Type").unstack("Category", fill_value=0)
 
             # Sort categories by size
             if not income_pivot.empty:
@@ -146,19 +150,18 @@ with left_col:
                 expense_pivot = expense_pivot[expense_pivot.sum().sort_values(ascending=False).index]
 
             all_months = sorted(set(income_pivot.index) | set(expense_pivot.index))
-            x_str = [m.strftime("%Y-%m") for m in all_months]
-
             income_pivot = income_pivot.reindex(all_months, fill_value=0)
             expense_pivot = expense_pivot.reindex(all_months, fill_value=0)
+            x_str = pd.DatetimeIndex(income_pivot.index).strftime("%Y-%m").tolist()
 
             income_colors = palette_hex("Blues", len(income_pivot.columns))
             expense_colors = palette_hex("Oranges", len(expense_pivot.columns))
 
-            fig = go.Figure()
+            traces = []
 
             # Income bars (stacked)
             for idx, col in enumerate(income_pivot.columns):
-                fig.add_trace(go.Bar(
+                traces.append(go.Bar(
                     name=f"Income - {col}",
                     x=x_str,
                     y=income_pivot[col].values,
@@ -169,7 +172,7 @@ with left_col:
 
             # Expense bars (stacked)
             for idx, col in enumerate(expense_pivot.columns):
-                fig.add_trace(go.Bar(
+                traces.append(go.Bar(
                     name=f"Expense - {col}",
                     x=x_str,
                     y=expense_pivot[col].values,
@@ -178,73 +181,83 @@ with left_col:
                     hovertemplate="<b>%{x}</b><br>%{fullData.name}: %{y:,.2f}<extra></extra>",
                 ))
 
-            fig.update_layout(
+            fig = go.Figure(data=traces, layout=dict(
                 title="Monthly Income & Expense Breakdown by Category",
                 barmode="stack",
                 xaxis_title="Month",
                 yaxis_title="Amount",
                 legend=dict(orientation="v", x=1.02, y=1),
-                template="simple_white",
                 margin=dict(l=40, r=260, t=60, b=80)
-            )
+            ))
 
 
         # ---------------------- STACKED BAR (INCOME+EXPENSE) ----------------------
         elif chart_type == "Stacked Bar":
-            fig = go.Figure()
-
-            fig.add_trace(go.Bar(
-                name="Income",
-                x=monthly["YearMonth"].dt.strftime("%Y-%m"),
-                y=monthly["Income"],
-                marker_color="#1f77b4"
-            ))
-
-            fig.add_trace(go.Bar(
-                name="Expense",
-                x=monthly["YearMonth"].dt.strftime("%Y-%m"),
-                y=monthly["Expense"],
-                marker_color="#ff7f0e"
-            ))
-
-            fig.update_layout(
+            traces = [
+                go.Bar(
+                    name="Income",
+                    x=monthly["YearMonthStr"],
+                    y=monthly["Income"],
+                    marker_color="#1f77b4"
+                ),
+                go.Bar(
+                    name="Expense",
+                    x=monthly["YearMonthStr"],
+                    y=monthly["Expense"],
+                    marker_color="#ff7f0e"
+                ),
+            ]
+
+            fig = go.Figure(data=traces, layout=dict(
                 title="Stacked Monthly Income and Expense",
                 barmode="stack",
                 xaxis_title="Month",
                 yaxis_title="Amount",
-                template="simple_white"
-            )
+            ))
 
 
         # ---------------------- PIE CHART (EXPENSE ONLY) ----------------------
         elif chart_type == "Pie":
-            expense_df = df_filtered[df_filtered["Type"] == "Expense"]
+            cube = monthly_cube(df_filtered)["Amount"]
+            types = cube.index.get_level_values("Type")
 
             totals = (
-                expense_df.groupby("Category")["Amount"].sum()
+                cube[types == "Expense"].groupby(level="Category", observed=True).sum()
                 .sort_values(ascending=False)
             )
 
-            fig = go.Figure()
-
-            fig.add_trace(go.Pie(
+            trace = go.Pie(
                 labels=totals.index,
                 values=totals.values,
                 hole=0.4,  # donut for readability
                 textinfo="none",  # no labels on slices
                 hovertemplate="%{label}: %{value:,.2f}<extra></extra>"
-            ))
+            )
 
-            fig.update_layout(
+            fig = go.Figure(data=[trace], layout=dict(
                 title="Expense Share by Category",
                 legend=dict(orientation="v", x=1.02, y=1),
-                template="simple_white"
-            )
+            ))
 
 
         # ---------------------- RENDER PLOT ----------------------
+        if static:
+            try:
+                st.image(figure_png(fig))
+                return
+            except (ValueError, RuntimeError) as e:
+                st.warning(f"Static rendering unavailable, showing interactive chart: {e}")
         st.plotly_chart(fig, use_container_width=True)
 
+
+# Main layout
+left_col, right_col = st.columns([3, 1])
+
+with left_col:
+    st.header("Trends & Charts")
+
+    render_charts(df_filtered)
+
     # Yearly category comparison
     st.subheader("Category totals by Year")
     cat_year = agg_by_category_year(df_filtered)
@@ -254,8 +267,9 @@ with left_col:
 
 with right_col:
     st.header("Summary")
-    total_income = df_filtered.loc[df_filtered["SignedAmount"] > 0, "SignedAmount"].sum()
-    total_expense = -df_filtered.loc[df_filtered["SignedAmount"] < 0, "SignedAmount"].sum()
+    signed = df_filtered["SignedAmount"].to_numpy()
+    total_income = np.maximum(signed, 0).sum()
+    total_expense = -np.minimum(signed, 0).sum()
     net = total_income - total_expense
 
     st.metric("Total income", f"{total_income:,.2f}")
@@ -265,12 +279,14 @@ with right_col:
     st.markdown("---")
     st.subheader("Top categories (by absolute amount)")
     top_cat = (
-        df_filtered.groupby("Category")
-        .agg(Total=("SignedAmount", "sum"))
+        monthly_cube(df_filtered)["SignedAmount"]
+        .groupby(level="Category", observed=True)
+        .sum()
         .abs()
-        .sort_values("Total", ascending=False)
+        .nlargest(10)
+        .to_frame("Total")
     )
-    st.table(top_cat.head(10))
+    st.table(top_cat)
 
 # Raw data viewer
 st.header("Raw data (filtered)")
@@ -4,15 +4,46 @@ Utility functions for the Streamlit financial dashboard
 from typing import List
 import pandas as pd
 import numpy as np
+import streamlit as st
+from pandas.api.types import union_categoricals
+
+try:
+    from pyarrow import csv as pa_csv
+except ImportError:
+    pa_csv = None
 
 REQUIRED_COLS = ["Date", "Category", "Account", "Type", "Amount"]
+CATEGORICAL_COLS = ["Type", "Category", "Account"]
+LABEL_COLS = ["Category", "Account"]
 
 
+@st.cache_data(show_spinner=False)
 def read_csv_to_df(file) -> pd.DataFrame:
     """
     Read uploaded CSV or file-like object into a cleaned DataFrame.
     """
-    df = pd.read_csv(file)
+    # Streamlit keys the cache on the uploaded file's contents, so the
+    # handle itself is passed through and parsed without an extra copy
+    file.seek(0)
+    try:
+        if pa_csv is None:
+            raise ImportError("pyarrow is not installed")
+        table = pa_csv.read_csv(
+            file,
+            read_options=pa_csv.ReadOptions(block_size=8 << 20),
+            # Blank / "N/A" text cells become NaN, as with pd.read_csv;
+            # labels stay text even when they look numeric
+            convert_options=pa_csv.ConvertOptions(
+                strings_can_be_null=True,
+                column_types={col: "string" for col in LABEL_COLS},
+            ),
+        )
+        df = table.to_pandas(date_as_object=False, split_blocks=True, self_destruct=True)
+        del table
+    except (ImportError, ValueError):
+        # pyarrow missing or a file pyarrow cannot parse
+        file.seek(0)
+        df = pd.read_csv(file, engine="c", low_memory=False, dtype={col: str for col in LABEL_COLS})
 
     # Normalize column names
     df.columns = [c.strip() for c in df.columns]
@@ -22,7 +53,8 @@ def read_csv_to_df(file) -> pd.DataFrame:
             if alt in df.columns:
                 df.rename(columns={alt: "Date"}, inplace=True)
 
-    df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
+    if not pd.api.types.is_datetime64_any_dtype(df["Date"]):
+        df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
 
     # Ensure required columns exist
     for col in ["Category", "Account", "Type", "Amount"]:
@@ -32,9 +64,15 @@ def read_csv_to_df(file) -> pd.DataFrame:
             else:
                 raise ValueError(f"Required column '{col}' not found.")
 
+    # One string dtype for every file's categories, so combine_dataframes
+    # can union them (an all-blank column would otherwise read as object)
+    for col in LABEL_COLS:
+        df[col] = df[col].astype("string").astype("category")
+
     # Normalize type
     df["Type"] = df["Type"].astype(str).str.strip().str.title()
     df.loc[~df["Type"].isin(["Income", "Expense"]), "Type"] = "Expense"
+    df["Type"] = pd.Categorical(df["Type"], categories=["Income", "Expense"])
 
     # Amount numeric
     df["Amount"] = pd.to_numeric(df["Amount"], errors="coerce").fillna(0)
@@ -44,38 +82,82 @@ def read_csv_to_df(file) -> pd.DataFrame:
     df["Month"] = df["Date"].dt.month
 
     # Signed amount (income positive, expense negative)
-    df["SignedAmount"] = df.apply(
-        lambda r: r["Amount"] if r["Type"] == "Income" else -abs(r["Amount"]), axis=1
-    )
+    amt = df["Amount"].to_numpy()
+    is_inc = df["Type"].cat.codes.to_numpy() == df["Type"].cat.categories.get_loc("Income")
+    df["SignedAmount"] = np.where(is_inc, amt, -np.abs(amt))
 
     return df
 
 
+@st.cache_data(show_spinner=False)
 def combine_dataframes(dfs: List[pd.DataFrame]) -> pd.DataFrame:
     if not dfs:
         return pd.DataFrame()
-    combined = pd.concat(dfs, ignore_index=True)
-    combined = combined[~combined["Date"].isna()].copy()
-    combined.sort_values("Date", inplace=True)
+
+    # union_categoricals needs one categories dtype per column
+    for col in CATEGORICAL_COLS:
+        if len({d[col].cat.categories.dtype for d in dfs}) > 1:
+            dfs = [d.assign(**{col: d[col].astype("string").astype("category")}) for d in dfs]
+
+    columns = list(dfs[0].columns)
+    if all(set(d.columns) == set(columns) for d in dfs[1:]):
+        # Stitch the column arrays directly; union_categoricals keeps the
+        # categorical columns categorical across differing category sets
+        cols = {}
+        for c in columns:
+            if all(isinstance(d[c].dtype, pd.CategoricalDtype) for d in dfs):
+                cols[c] = union_categoricals([d[c] for d in dfs], sort_categories=True)
+            else:
+                cols[c] = np.concatenate([d[c].to_numpy() for d in dfs])
+        combined = pd.DataFrame(cols, copy=False)
+    else:
+        # Files with different columns: align categories and let concat pad
+        for col in CATEGORICAL_COLS:
+            cats = union_categoricals([d[col] for d in dfs], sort_categories=True).categories
+            dfs = [d.assign(**{col: d[col].cat.set_categories(cats)}) for d in dfs]
+        combined = pd.concat(dfs, ignore_index=True)
+
+    combined = combined[combined["Date"].notna()]
+    # One-year-per-file uploads usually arrive already in date order
+    if not combined["Date"].is_monotonic_increasing:
+        combined = combined.sort_values("Date", kind="mergesort")
     return combined
 
 
+@st.cache_data(show_spinner=False)
 def agg_monthly(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    df["YearMonth"] = df["Date"].dt.to_period("M").dt.to_timestamp()
-    monthly = df.groupby(["YearMonth"]).agg(
-        Income=("SignedAmount", lambda s: s[s > 0].sum()),
-        Expense=("SignedAmount", lambda s: -s[s < 0].sum()),
-        Net=("SignedAmount", "sum"),
-    )
+    # Group on a separate month-key array and a small frame of the three
+    # summed columns rather than copying every column of df
+    ym = df["Date"].to_numpy().astype("datetime64[M]")
+    signed = df["SignedAmount"]
+    parts = pd.DataFrame({
+        "Income": signed.clip(lower=0),
+        "Expense": (-signed).clip(lower=0),
+        "Net": signed,
+    })
+    monthly = parts.groupby(ym, sort=True).sum()
+    monthly.index.name = "YearMonth"
     monthly.reset_index(inplace=True)
+    # Axis labels, formatted once per cached result rather than per rerun
+    monthly["YearMonthStr"] = monthly["YearMonth"].dt.strftime("%Y-%m").astype("string")
     return monthly
 
 
+@st.cache_data(show_spinner=False)
 def agg_by_category_year(df: pd.DataFrame) -> pd.DataFrame:
     summary = (
-        df.groupby(["Year", "Category"])
+        df.groupby(["Year", "Category"], observed=True)
         .agg(Total=("SignedAmount", "sum"))
         .reset_index()
     )
     return summary
+
+
+@st.cache_data(show_spinner=False)
+def monthly_cube(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Amount and SignedAmount summed by (YearMonth, Type, Category), shared by
+    the per-category charts and the top categories table.
+    """
+    ym = pd.Index(df["Date"].to_numpy().astype("datetime64[M]"), name="YearMonth")
+    return df.groupby([ym, "Type", "Category"], observed=True)[["Amount", "SignedAmount"]].sum()
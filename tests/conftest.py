@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The app imports utils as a top-level module from app/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
@@ -0,0 +1,42 @@
+import io
+
+from utils import combine_dataframes, read_csv_to_df
+
+HEADER = b"Date,Category,Account,Type,Amount\n"
+
+
+def read(body, header=HEADER):
+    return read_csv_to_df(io.BytesIO(header + body))
+
+
+def test_combine_files_with_blank_account_column():
+    # Second file has a different column set, so this goes through pd.concat
+    a = read(b"2022-01-05,Food,Checking,Expense,5\n")
+    b = read(b"2023-01-05,Food,,Expense,5,x\n", header=HEADER.replace(b"Amount", b"Amount,Note"))
+
+    combined = combine_dataframes([a, b])
+
+    assert list(combined["Account"].cat.categories) == ["Checking"]
+    assert combined["Account"].isna().tolist() == [False, True]
+
+
+def test_combine_files_with_numeric_and_text_accounts():
+    a = read(b"2022-01-05,Food,123,Expense,5\n")
+    b = read(b"2023-01-05,Food,123,Expense,5\n2023-02-05,Rent,,Expense,5\n")
+    c = read(b"2023-03-05,Food,Checking,Expense,5\n")
+
+    combined = combine_dataframes([a, b, c])
+
+    assert list(combined["Account"].cat.categories) == ["123", "Checking"]
+    assert combined["Account"].isna().sum() == 1
+
+
+def test_combine_frames_with_mismatched_category_dtypes():
+    a = read(b"2022-01-05,Food,Checking,Expense,5\n")
+    b = read(b"2023-01-05,Food,Checking,Expense,5\n")
+    b["Account"] = b["Account"].astype(object).astype("category")
+
+    combined = combine_dataframes([a, b])
+
+    assert list(combined["Account"].cat.categories) == ["Checking"]
+    assert len(combined) == 2